@@ -1,8 +1,30 @@
+import functools
+import random
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # Optional: stream-parse large responses instead of materializing them.
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None  # type: ignore[assignment]
 
 from config import CONFIG
 from oauth import get_headers
@@ -18,7 +40,9 @@ class RateLimitExceededError(Exception):
         self.response_text = response_text
 
 
-ParamsType = Union[Dict[str, Any], List[Tuple[str, Any]]]
+# A str is sent as an already-encoded query string.
+ParamsType = Union[Dict[str, Any], List[Tuple[str, Any]], str]
+T = TypeVar("T")
 
 
 @dataclass
@@ -28,7 +52,11 @@ class FreelancerApiClient:
 
     Handles:
     - global delay (rate limiting)
-    - retries with exponential backoff on 429 / transient 5xx / network timeouts
+    - retries with jittered exponential backoff on 429 / transient 5xx / network timeouts
+
+    Uses a pooled `requests.Session` by default. With `http2=True` (CONFIG["http2"],
+    needs `httpx[http2]`) requests go through `httpx.Client` instead, so concurrent
+    workers multiplex over one HTTP/2 connection.
     """
 
     api_root_url: str
@@ -37,12 +65,43 @@ class FreelancerApiClient:
     max_retries: int = 6
     backoff_base_s: float = 1.0
     backoff_max_s: float = 60.0
+    http2: bool = False
+    # Max pooled connections to the API host; should cover every thread that can
+    # have a request in flight at once.
+    pool_maxsize: int = 64
+    # Set on the first fatal 429 (exit_on_429): every thread sharing this client then
+    # fails its next request instead of sending it.
+    stop_event: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
 
     def __post_init__(self) -> None:
         self.api_root_url = self.api_root_url.rstrip("/")
+        self._auth_token: Optional[str] = None
+        if self.http2:
+            # Import only when enabled so the default setup doesn't need httpx.
+            import httpx
+
+            self.session = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                timeout=self.timeout_s,
+            )
+            self._retryable_errors: Tuple[Type[BaseException], ...] = (httpx.TransportError,)
+            return
+
         self.session = requests.Session()
+        # Keep connections alive across the whole run so each call skips the TCP/TLS
+        # handshake. Retries are handled in _request_json, not by urllib3.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+        self._retryable_errors = (
+            requests.Timeout,
+            requests.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        )
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def _derive_api_root_from_legacy(api_base_url: str) -> str:
         # Example legacy: https://www.freelancer.com/api/users/0.1 -> https://www.freelancer.com/api
         api_base_url = api_base_url.rstrip("/")
@@ -64,6 +123,10 @@ class FreelancerApiClient:
             min_interval_s=float(CONFIG.get("request_min_interval_s", 0.8)),
             requests_per_minute=CONFIG.get("requests_per_minute", 50),
             jitter_s=float(CONFIG.get("request_jitter_s", 0.2)),
+            rate_increase_factor=float(CONFIG.get("rate_increase_factor", 0.05)),
+            rate_increase_step_rpm=float(CONFIG.get("rate_increase_step_rpm", 1.0)),
+            rate_decrease_factor=float(CONFIG.get("rate_decrease_factor", 0.5)),
+            rate_min_rpm=float(CONFIG.get("rate_min_rpm", 5.0)),
         )
         return cls(
             api_root_url=str(api_root),
@@ -72,12 +135,57 @@ class FreelancerApiClient:
             max_retries=int(CONFIG.get("max_retries", 6)),
             backoff_base_s=float(CONFIG.get("backoff_base_s", 1.0)),
             backoff_max_s=float(CONFIG.get("backoff_max_s", 60.0)),
+            http2=bool(CONFIG.get("http2", False)),
+            # lead_generator runs user-batch fetches and per-freelancer review fetches
+            # on separate pools, all sharing this client.
+            pool_maxsize=max(
+                1, int(CONFIG.get("concurrency", 4)) + int(CONFIG.get("freelancer_workers", 4))
+            ),
         )
 
+    def _url(self, path: str) -> str:
+        # Relative API paths start with "/"; absolute URLs with "http".
+        return path if path[:1] == "h" else self.api_root_url + path
+
     def get(self, path: str, *, params: Optional[ParamsType] = None) -> Dict[str, Any]:
-        url = path if path.startswith("http") else f"{self.api_root_url}{path}"
+        url = self._url(path)
         return self._request_json("GET", url, params=params)
 
+    def get_items(
+        self,
+        path: str,
+        *,
+        params: Optional[ParamsType] = None,
+        prefix: Union[str, Tuple[str, ...]],
+        transform: Callable[[Any], T],
+    ) -> List[T]:
+        """
+        GET and return `transform(item)` for every JSON item at the ijson-style
+        `prefix` (e.g. "result.reviews.item"). When the response shape varies, pass
+        alternative prefixes in order of preference (e.g. ("result.reviews.item",
+        "reviews.item")): items come from the first one that has any.
+
+        With ijson installed the body is parsed while it streams in, so only the
+        transformed values are kept (not the whole object graph). Without ijson
+        this falls back to a regular `get()` and walks the parsed payload.
+        """
+        url = self._url(path)
+        prefixes = (prefix,) if isinstance(prefix, str) else prefix
+        if ijson is None:
+            payload = self._request_json("GET", url, params=params)
+            for p in prefixes:
+                items = [transform(item) for item in _iter_prefix(payload, p.split("."))]
+                if items:
+                    return items
+            return []
+        return self._request(
+            "GET",
+            url,
+            params=params,
+            stream=True,
+            on_success=lambda resp: self._stream_items(resp, prefixes, transform),
+        )
+
     def _request_json(
         self,
         method: str,
@@ -85,57 +193,73 @@ class FreelancerApiClient:
         *,
         params: Optional[ParamsType] = None,
     ) -> Dict[str, Any]:
+        return self._request(
+            method,
+            url,
+            params=params,
+            on_success=lambda resp: self._parse_json(resp, url),
+        )
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[ParamsType] = None,
+        stream: bool = False,
+        on_success: Callable[[Any], T],
+    ) -> T:
         last_exc: Optional[BaseException] = None
         last_status: Optional[int] = None
         last_text: Optional[str] = None
+        prev_sleep = self.backoff_base_s
 
-        for attempt in range(self.max_retries + 1):
-            self.limiter.wait()
+        self._ensure_auth_headers()
+        for _ in range(self.max_retries + 1):
+            self._check_stopped()
+            self.limiter.acquire(cancel=self.stop_event)
+            self._check_stopped()
             try:
-                resp = self.session.request(
-                    method,
-                    url,
-                    headers=get_headers(),
-                    params=params,
-                    timeout=self.timeout_s,
-                )
+                resp = self._send(method, url, params=params, stream=stream)
 
                 last_status = resp.status_code
-                # keep only a small snippet to avoid huge logs
-                try:
-                    last_text = (resp.text or "")[:500]
-                except Exception:
-                    last_text = None
 
                 if resp.status_code == 429:
+                    last_text = self._snippet(resp)
+                    self.limiter.on_throttle(resp.headers.get("Retry-After"))
                     exit_on_429 = CONFIG.get("exit_on_429", True)
                     if exit_on_429:
+                        self.stop_event.set()
                         raise RateLimitExceededError(
                             "API returned 429 Too Many Requests; exiting.",
                             status_code=429,
                             response_text=last_text,
                         )
-                    sleep_s = self._compute_retry_sleep(resp, attempt)
-                    time.sleep(sleep_s)
+                    prev_sleep = self._compute_retry_sleep(resp, prev_sleep)
+                    self.stop_event.wait(prev_sleep)
                     continue
                 if resp.status_code in (500, 502, 503, 504):
-                    sleep_s = self._compute_retry_sleep(resp, attempt)
-                    time.sleep(sleep_s)
+                    last_text = self._snippet(resp)
+                    prev_sleep = self._compute_retry_sleep(resp, prev_sleep)
+                    self.stop_event.wait(prev_sleep)
                     continue
 
+                if stream and resp.status_code >= 400:
+                    # Non-retryable error: release the pooled connection / HTTP/2 stream
+                    # before raise_for_status() propagates (nothing else will read it).
+                    resp.close()
                 resp.raise_for_status()
-                return resp.json()
+                self.limiter.on_success()
+                return on_success(resp)
 
-            except (requests.Timeout, requests.ConnectionError) as e:
+            except self._retryable_errors as e:
                 last_exc = e
-                time.sleep(self._backoff(attempt))
+                prev_sleep = self._backoff(prev_sleep)
+                self.stop_event.wait(prev_sleep)
                 continue
             except requests.HTTPError as e:
                 # Non-retryable HTTP error
                 raise
-            except ValueError:
-                # JSON decode failed, return text-ish wrapper
-                return {"ok": False, "raw": getattr(resp, "text", None), "url": url}
 
         if last_exc:
             raise last_exc
@@ -144,16 +268,129 @@ class FreelancerApiClient:
             f"(last_status={last_status}, last_body={last_text!r})"
         )
 
-    def _compute_retry_sleep(self, resp: requests.Response, attempt: int) -> float:
+    def _check_stopped(self) -> None:
+        if self.stop_event.is_set():
+            raise RateLimitExceededError("Stopping: an earlier request got 429 Too Many Requests.")
+
+    def _send(
+        self, method: str, url: str, *, params: Optional[ParamsType], stream: bool
+    ) -> Any:
+        if self.http2:
+            request = self.session.build_request(
+                method, url, params=params, timeout=self.timeout_s
+            )
+            return self.session.send(request, stream=stream)
+        return self.session.request(
+            method, url, params=params, timeout=self.timeout_s, stream=stream
+        )
+
+    def _snippet(self, resp: Any) -> Optional[str]:
+        # keep only a small snippet to avoid huge logs; decoding raw bytes skips
+        # charset detection, and success bodies are never decoded twice
+        try:
+            body = resp.read() if self.http2 else resp.content
+            return body[:500].decode("utf-8", "replace")
+        except Exception:
+            return None
+
+    @staticmethod
+    def _parse_json(resp: Any, url: str) -> Dict[str, Any]:
+        try:
+            return resp.json()
+        except ValueError:
+            # JSON decode failed, return text-ish wrapper
+            return {"ok": False, "raw": getattr(resp, "text", None), "url": url}
+
+    def _stream_items(
+        self, resp: Any, prefixes: Tuple[str, ...], transform: Callable[[Any], T]
+    ) -> List[T]:
+        # Feed decoded chunks to ijson's push parser (one per prefix); transport errors
+        # while reading surface as the client's retryable exceptions and are retried.
+        # Once a prefix yields items the less preferred parsers are dropped, so the
+        # body is usually parsed once, not once per prefix.
+        parsers = []
+        for prefix in prefixes:
+            events = ijson.sendable_list()
+            parsers.append((ijson.items_coro(events, prefix, use_float=True), events, []))
+        if self.http2:
+            chunks = resp.iter_bytes(chunk_size=64 * 1024)
+        else:
+            chunks = resp.iter_content(chunk_size=64 * 1024)
+        try:
+            for chunk in chunks:
+                for i, (parser, events, out) in enumerate(parsers):
+                    parser.send(chunk)
+                    if events:
+                        out.extend(transform(item) for item in events)
+                        del events[:]
+                        del parsers[i + 1 :]
+                        break
+            for parser, events, out in parsers:
+                parser.close()
+                out.extend(transform(item) for item in events)
+        except ijson.JSONError:
+            # Malformed body: treat like an empty result (same as a failed json decode)
+            return []
+        finally:
+            resp.close()
+        for _, _, out in parsers:
+            if out:
+                return out
+        return []
+
+    def _ensure_auth_headers(self) -> None:
+        # Auth header lives on the session; rebuild it only when the token changes.
+        token = CONFIG.get("oauth_access_token")
+        if token != self._auth_token:
+            self.session.headers.update(get_headers())
+            self._auth_token = token
+
+    def _compute_retry_sleep(self, resp: Any, prev_sleep: float) -> float:
+        sleep_s = self._backoff(prev_sleep)
         retry_after = resp.headers.get("Retry-After")
         if retry_after:
             try:
-                return min(self.backoff_max_s, float(retry_after))
+                # Never retry earlier than the server asked for.
+                return max(float(retry_after), sleep_s)
             except ValueError:
                 pass
-        return self._backoff(attempt)
+        return sleep_s
+
+    def _backoff(self, prev_sleep: float) -> float:
+        # "Decorrelated jitter" backoff, capped: randomized so concurrent workers
+        # don't retry in lockstep, but still growing roughly exponentially.
+        upper = min(self.backoff_max_s, max(self.backoff_base_s, prev_sleep * 3))
+        return random.uniform(self.backoff_base_s, upper)
+
+
+_client: Optional[FreelancerApiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> FreelancerApiClient:
+    """
+    Process-wide FreelancerApiClient built from CONFIG on first use.
+
+    Sharing one instance means one connection pool and one RateLimiter for every
+    caller; separate clients would each open connections and pace independently.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FreelancerApiClient.from_config()
+    return _client
 
-    def _backoff(self, attempt: int) -> float:
-        # exponential backoff capped
-        return min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
 
+def _iter_prefix(node: Any, parts: List[str]) -> Iterator[Any]:
+    # Non-streaming equivalent of an ijson prefix ("item" = every list element).
+    if not parts:
+        yield node
+        return
+    head, rest = parts[0], parts[1:]
+    if head == "item":
+        if isinstance(node, list):
+            for child in node:
+                yield from _iter_prefix(child, rest)
+    elif isinstance(node, dict) and head in node:
+        yield from _iter_prefix(node[head], rest)
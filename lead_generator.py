@@ -1,41 +1,203 @@
 import sys
-import time
-from typing import Any, Dict, List
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from config import CONFIG
-from http_client import FreelancerApiClient, RateLimitExceededError
-from normalize import minimize_user, to_supabase_client_row
-from reviews_api import extract_reviewer_ids, fetch_all_reviews_for_user
+from http_client import FreelancerApiClient, RateLimitExceededError, get_client
+from normalize import MINIMIZED_SCHEMA_VERSION, minimize_user, to_supabase_client_row
+from reviews_api import fetch_all_reviewer_ids_for_user
 from supabase_storage import upsert_users
 from sqlite_cache import (
     SqliteCompletedFreelancers,
     SqliteUserCache,
     migrate_json_cache_to_sqlite,
 )
-from storage import append_jsonl, load_json, save_json_atomic
+from storage import JsonlWriter, load_json, save_json_atomic
 from users_api import (
     extract_user_id,
     extract_users,
-    extract_users_map,
     fetch_directory_page,
-    fetch_users_by_ids,
+    fetch_users_by_ids_chunked,
 )
 
 
-def chunked(items: List[int], size: int) -> List[List[int]]:
-    return [items[i : i + size] for i in range(0, len(items), size)]
+@dataclass
+class FreelancerOutcome:
+    """Result of the network half of processing one freelancer."""
+
+    reviewer_count: int = 0
+    # Minimized reviewer rows to add to the local cache (only set when Supabase succeeded)
+    cache_rows: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list)
+    # Reviewer IDs whose Supabase upsert failed, here or in the sibling worker that
+    # claimed them (None = no failure)
+    supabase_failed_ids: Optional[List[Any]] = None
+    # Set when reviews could not be fetched; nothing else was attempted
+    reviews_error: Optional[str] = None
+
+
+@dataclass
+class ReviewerClaim:
+    """One freelancer's share of the reviewers missing from the cache."""
+
+    # IDs this worker fetches and stores
+    missing: List[int]
+    # Resolved by ReviewerClaims.finish(): True = stored in Supabase, False = released
+    done: "Future[bool]"
+    # IDs a sibling worker is storing, grouped by that sibling's `done`
+    borrowed: Dict["Future[bool]", List[int]] = field(default_factory=dict)
+
+    def wait_borrowed(self) -> List[int]:
+        """Wait for the siblings' claims; return the borrowed IDs they failed to store."""
+        failed: List[int] = []
+        for done, ids in self.borrowed.items():
+            if not done.result():
+                failed.extend(ids)
+        return failed
+
+
+@dataclass
+class ReviewerClaims:
+    """
+    Reviewer IDs some worker has taken on fetching and storing in this run.
+
+    Freelancers on a page run concurrently while `known_cached` only grows when the
+    main thread applies outcomes, so without claims every worker would re-fetch the
+    reviewers it shares with its siblings. A worker that finds an ID claimed borrows
+    it and waits for the claimer's result, so it is only "ok" if that upsert worked.
+    Stored IDs stay claimed (they are cached by then); failed ones are released so
+    later freelancers retry them.
+    """
+
+    _pending: Dict[int, "Future[bool]"] = field(default_factory=dict)
+    _stored: Set[int] = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def claim_missing(self, reviewer_ids: List[int], known_cached: Set[int]) -> ReviewerClaim:
+        """Claim the IDs that are neither cached nor stored; borrow the ones in flight."""
+        claim = ReviewerClaim(missing=[], done=Future())
+        with self._lock:
+            for rid in reviewer_ids:
+                if rid in known_cached or rid in self._stored:
+                    continue
+                other = self._pending.get(rid)
+                if other is None:
+                    self._pending[rid] = claim.done
+                    claim.missing.append(rid)
+                else:
+                    claim.borrowed.setdefault(other, []).append(rid)
+        return claim
+
+    def finish(self, claim: ReviewerClaim, stored: bool) -> None:
+        """Resolve `claim`: keep its IDs as stored, or release them for a retry."""
+        with self._lock:
+            for rid in claim.missing:
+                del self._pending[rid]
+            if stored:
+                self._stored.update(claim.missing)
+        claim.done.set_result(stored)
+
+
+def process_freelancer(
+    client: FreelancerApiClient,
+    fetch_pool: ThreadPoolExecutor,
+    freelancer_id: int,
+    *,
+    known_cached: Set[int],
+    claims: ReviewerClaims,
+    reviews_max: int,
+    reviews_page_size: int,
+    users_batch_size: int,
+    cooldown_on_reviews_failure_s: int,
+) -> FreelancerOutcome:
+    """
+    Fetch reviews -> reviewer IDs -> missing reviewer details -> Supabase upsert.
+
+    Runs in a worker thread: it only does API/Supabase calls and reads
+    `known_cached`. SQLite writes, resume state and logging stay with the caller.
+    A fatal 429 (RateLimitExceededError) is re-raised so the run stops.
+    """
+    try:
+        reviewer_id_set = fetch_all_reviewer_ids_for_user(
+            client,
+            to_user_id=freelancer_id,
+            max_reviews=reviews_max,
+            page_size=reviews_page_size,
+            compact=True,
+        )
+    except RateLimitExceededError:
+        raise
+    except Exception as e:
+        # Cool down before *any* worker hits the API again (shared limiter pause).
+        client.limiter.pause(max(0, cooldown_on_reviews_failure_s))
+        return FreelancerOutcome(reviews_error=str(e))
+
+    # Already de-duplicated (a set); batch order does not matter, so skip sorting.
+    reviewer_ids = list(reviewer_id_set)
+    outcome = FreelancerOutcome(reviewer_count=len(reviewer_ids))
+
+    # Fetch missing reviewer details with caching to reduce API calls; reviewers a
+    # sibling worker is already fetching are left to it.
+    claim = claims.claim_missing(reviewer_ids, known_cached)
+    stored = False
+    try:
+        if claim.missing:
+            # Overlap batch round-trips on the shared fetch pool.
+            users_map = fetch_users_by_ids_chunked(
+                client,
+                claim.missing,
+                chunk=users_batch_size,
+                compact=True,
+                status=True,
+                executor=fetch_pool,
+            )
+            supabase_rows = []
+            cache_rows = []
+            for uid, user_obj in users_map.items():
+                minimized = minimize_user(user_obj)
+                # Skip closed accounts completely (no Supabase, no SQLite cache)
+                if bool(minimized.get("closed")):
+                    continue
+                cache_rows.append((uid, minimized))
+                supabase_rows.append(to_supabase_client_row(uid, minimized))
+
+            # Store to Supabase in one upsert per freelancer (chunked by upsert_users)
+            if upsert_users(supabase_rows):
+                outcome.cache_rows = cache_rows
+                stored = True
+            else:
+                outcome.supabase_failed_ids = [r.get("id") for r in supabase_rows]
+        else:
+            stored = True
+    finally:
+        # Always resolve, so siblings waiting on these IDs never hang.
+        claims.finish(claim, stored)
+
+    if outcome.supabase_failed_ids is not None:
+        # If Supabase is the only output, don't mark these as cached yet.
+        # We'll retry on a future run. (Interrupted if the run is stopping.)
+        client.stop_event.wait(30)
+
+    # Borrowed reviewers count only once their claimer has stored them; if it
+    # failed, this freelancer is "partial" too instead of "ok".
+    lost = claim.wait_borrowed()
+    if lost:
+        outcome.supabase_failed_ids = (outcome.supabase_failed_ids or []) + lost
+    return outcome
 
 
 def run_lead_generation() -> None:
     """
     Process:
     - Page through freelancer directory (most reviews first) until the last user (offset pagination).
-    - For each freelancer user_id:
+      The next page is prefetched while the current one is processed.
+    - For each freelancer user_id (several at a time, see CONFIG["freelancer_workers"]):
       - fetch reviews (paginated up to reviews_max, for freelancers with 4000+ reviews)
       - extract reviewer IDs (from_user_id)
-      - fetch reviewer user objects (batched + cached)
+      - fetch reviewer user objects (batched + cached, batches fetched concurrently)
       - write a JSONL lead record
-    - Persist state after each user so you can safely resume.
+    - Persist state every few users (and at every page end) so you can safely resume.
     """
 
     state_path = str(CONFIG.get("state_path", "state.json"))
@@ -47,6 +209,11 @@ def run_lead_generation() -> None:
     reviews_max = int(CONFIG.get("reviews_max", 10000))
     reviews_page_size = int(CONFIG.get("reviews_page_size", 500))
     users_batch_size = int(CONFIG.get("users_batch_size", 50))
+    # Max in-flight API requests; the shared RateLimiter still paces request starts.
+    concurrency = max(1, int(CONFIG.get("concurrency", 4)))
+    freelancer_workers = max(1, int(CONFIG.get("freelancer_workers", 4)))
+    # Rewriting state.json per user is a full write+rename; a crash re-does at most N users.
+    state_flush_every = max(1, int(CONFIG.get("state_flush_every", 10)))
 
     state = load_json(
         state_path,
@@ -58,7 +225,7 @@ def run_lead_generation() -> None:
     offset = int(directory_state.get("offset", 0))
     index_in_page = int(directory_state.get("index_in_page", 0))
 
-    client = FreelancerApiClient.from_config()
+    client = get_client()
 
     # One-time migration (if you previously used JSON cache)
     if cache_path.endswith(".db"):
@@ -66,57 +233,103 @@ def run_lead_generation() -> None:
         if migrated:
             print(f"[cache] migrated {migrated} users from user_cache.json to {cache_path}")
 
-    user_cache = SqliteUserCache(cache_path)
+    user_cache = SqliteUserCache(
+        cache_path,
+        compress=bool(CONFIG.get("user_cache_zstd", False)),
+        zstd_dict_path=CONFIG.get("user_cache_zstd_dict") or None,
+    )
+    # In-memory index of cached reviewer IDs: the per-freelancer "missing" scan becomes
+    # set lookups instead of SQLite queries. Users stored by an older minimize_user
+    # (or of unknown version) count as missing, so they are refetched and re-normalized.
+    known_cached: Set[int] = set(user_cache.iter_ids(schema_version=MINIMIZED_SCHEMA_VERSION))
+    claims = ReviewerClaims()
     completed = SqliteCompletedFreelancers(cache_path)
     completed_dirty = 0
+    state_dirty = 0
+    errors_log = JsonlWriter(errors_path, flush_every=state_flush_every)
+    fetch_pool = ThreadPoolExecutor(max_workers=concurrency)
+    freelancer_pool = ThreadPoolExecutor(max_workers=freelancer_workers)
+    aborted = False
     try:
+        next_page = fetch_pool.submit(
+            fetch_directory_page,
+            client,
+            limit=directory_limit,
+            offset=offset,
+            query="",
+            compact=True,
+        )
         while True:
-            payload = fetch_directory_page(
-                client, limit=directory_limit, offset=offset, query="", compact=True
-            )
+            payload = next_page.result()
             users = extract_users(payload)
             if not users:
                 # reached last page
                 break
 
+            # Prefetch the next directory page while this one is being processed.
+            next_page = fetch_pool.submit(
+                fetch_directory_page,
+                client,
+                limit=directory_limit,
+                offset=offset + directory_limit,
+                query="",
+                compact=True,
+            )
+
+            # Process the page's freelancers concurrently, but apply results in directory
+            # order so resume state only ever advances over fully processed freelancers.
+            pending = []
             for idx, u in enumerate(users):
                 if idx < index_in_page:
                     continue
-
                 freelancer_id = extract_user_id(u)
-                if freelancer_id is None:
+                fut = None
+                if freelancer_id is not None:
+                    fut = freelancer_pool.submit(
+                        process_freelancer,
+                        client,
+                        fetch_pool,
+                        freelancer_id,
+                        known_cached=known_cached,
+                        claims=claims,
+                        reviews_max=reviews_max,
+                        reviews_page_size=reviews_page_size,
+                        users_batch_size=users_batch_size,
+                        cooldown_on_reviews_failure_s=cooldown_on_reviews_failure_s,
+                    )
+                pending.append((idx, u, freelancer_id, fut))
+
+            for idx, u, freelancer_id, fut in pending:
+                if fut is None:
                     # still advance progress to avoid getting stuck
                     directory_state["index_in_page"] = idx + 1
-                    save_json_atomic(state_path, state)
+                    state_dirty += 1
+                    if state_dirty >= state_flush_every:
+                        save_json_atomic(state_path, state)
+                        state_dirty = 0
                     continue
 
-                try:
-                    reviews_payload = fetch_all_reviews_for_user(
-                        client,
-                        to_user_id=freelancer_id,
-                        max_reviews=reviews_max,
-                        page_size=reviews_page_size,
-                        compact=True,
-                    )
-                except Exception as e:
+                outcome = fut.result()
+                if outcome.reviews_error is not None:
                     # Log and skip this freelancer so the job can continue.
-                    append_jsonl(
-                        errors_path,
+                    errors_log.write(
                         {
                             "type": "reviews_fetch_failed",
                             "freelancer_user_id": freelancer_id,
                             "offset": offset,
                             "index_in_page": idx,
-                            "error": str(e),
+                            "error": outcome.reviews_error,
                         },
                     )
-                    print(f"[warn] reviews fetch failed for {freelancer_id}: {e}")
-                    time.sleep(max(0, cooldown_on_reviews_failure_s))
+                    print(f"[warn] reviews fetch failed for {freelancer_id}: {outcome.reviews_error}")
 
                     directory_state["offset"] = offset
                     directory_state["index_in_page"] = idx + 1
                     directory_state["limit"] = directory_limit
-                    save_json_atomic(state_path, state)
+                    state_dirty += 1
+                    if state_dirty >= state_flush_every:
+                        save_json_atomic(state_path, state)
+                        state_dirty = 0
 
                     # Record that we attempted this freelancer but couldn't fetch reviews.
                     completed.mark(
@@ -135,51 +348,24 @@ def run_lead_generation() -> None:
                         completed_dirty = 0
                     continue
 
-                reviewer_ids = sorted(extract_reviewer_ids(reviews_payload))
-                reviewer_count = len(reviewer_ids)
-                had_supabase_failure = False
-
-                # Fetch missing reviewer details with caching to reduce API calls
-                missing = [rid for rid in reviewer_ids if user_cache.get(rid) is None]
-                if missing:
-                    for batch in chunked(missing, users_batch_size):
-                        users_payload = fetch_users_by_ids(
-                            client, batch, compact=True, status=True
-                        )
-                        users_map = extract_users_map(users_payload)
-
-                        supabase_rows = []
-                        cache_rows = []
-                        for uid, user_obj in users_map.items():
-                            minimized = minimize_user(user_obj)
-                            # Skip closed accounts completely (no Supabase, no SQLite cache)
-                            if bool(minimized.get("closed")):
-                                continue
-                            cache_rows.append((uid, minimized))
-                            supabase_rows.append(to_supabase_client_row(uid, minimized))
-
-                        # Store to Supabase as soon as we have details
-                        ok = upsert_users(supabase_rows)
-                        if not ok:
-                            had_supabase_failure = True
-                            append_jsonl(
-                                errors_path,
-                                {
-                                    "type": "supabase_upsert_failed",
-                                    "freelancer_user_id": freelancer_id,
-                                    "offset": offset,
-                                    "index_in_page": idx,
-                                    "batch_user_ids": [r.get("id") for r in supabase_rows],
-                                },
-                            )
-                            # If Supabase is the only output, don't mark these as cached yet.
-                            # We'll retry on a future run.
-                            time.sleep(30)
-                            continue
-
-                        # Store to local SQLite cache in one transaction per batch
-                        user_cache.set_many(cache_rows)
-                        user_cache.commit()
+                had_supabase_failure = outcome.supabase_failed_ids is not None
+                if had_supabase_failure:
+                    errors_log.write(
+                        {
+                            "type": "supabase_upsert_failed",
+                            "freelancer_user_id": freelancer_id,
+                            "offset": offset,
+                            "index_in_page": idx,
+                            "batch_user_ids": outcome.supabase_failed_ids,
+                        },
+                    )
+                if outcome.cache_rows:
+                    # Store to local SQLite cache in one short transaction per freelancer
+                    # (on this thread only; not held open across network round-trips).
+                    user_cache.bulk_set(
+                        outcome.cache_rows, schema_version=MINIMIZED_SCHEMA_VERSION
+                    )
+                    known_cached.update(uid for uid, _ in outcome.cache_rows)
 
                 # No local leads output; Supabase is the source of truth.
 
@@ -190,7 +376,7 @@ def run_lead_generation() -> None:
                     location=(u.get("location") if isinstance(u.get("location"), dict) else None),
                     offset=offset,
                     index_in_page=idx,
-                    reviewer_count=reviewer_count,
+                    reviewer_count=outcome.reviewer_count,
                     status="ok" if not had_supabase_failure else "partial",
                 )
                 completed_dirty += 1
@@ -198,17 +384,20 @@ def run_lead_generation() -> None:
                     completed.commit()
                     completed_dirty = 0
 
-                # Save progress after each user (safe resume)
+                # Record progress after each user; flushed every state_flush_every users
                 directory_state["offset"] = offset
                 directory_state["index_in_page"] = idx + 1
                 directory_state["limit"] = directory_limit
-                save_json_atomic(state_path, state)
+                state_dirty += 1
+                if state_dirty >= state_flush_every:
+                    save_json_atomic(state_path, state)
+                    state_dirty = 0
 
                 print(
                     f'ID: "{freelancer_id}" '
                     f'Username: "{(u.get("username") or "")}" '
                     f'Public Name: "{(u.get("public_name") or "")}" '
-                    f'Reviews: "{reviewer_count}"'
+                    f'Reviews: "{outcome.reviewer_count}"'
                 )
 
             # page completed
@@ -217,7 +406,20 @@ def run_lead_generation() -> None:
             directory_state["offset"] = offset
             directory_state["index_in_page"] = 0
             save_json_atomic(state_path, state)
+            state_dirty = 0
+            errors_log.flush()
+    except BaseException:
+        # e.g. a fatal 429: make running workers fail their next request right away.
+        aborted = True
+        client.stop_event.set()
+        raise
     finally:
+        # On abort, don't wait for running workers; they only touch the API/Supabase.
+        freelancer_pool.shutdown(wait=not aborted, cancel_futures=True)
+        fetch_pool.shutdown(wait=not aborted, cancel_futures=True)
+        if state_dirty:
+            save_json_atomic(state_path, state)
+        errors_log.close()
         try:
             if completed_dirty:
                 completed.commit()
@@ -1,16 +1,15 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import time
 from typing import Any, Dict, Optional
 
+# `joined_at` is `timestamp without time zone`; we store naive UTC.
+_JOINED_AT_FMT = "%Y-%m-%d %H:%M:%S"
 
-def _get(d: Any, *path: str) -> Any:
-    cur = d
-    for p in path:
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(p)
-    return cur
+# Bump when minimize_user's output shape changes. The lead generator stores it with
+# every cached user (users.schema_version) and refetches users cached with any other
+# version, so bumping it re-normalizes them lazily as they show up again.
+MINIMIZED_SCHEMA_VERSION = 1
 
 
 def minimize_user(user_obj: Dict[str, Any]) -> Dict[str, Any]:
@@ -31,37 +30,32 @@ def minimize_user(user_obj: Dict[str, Any]) -> Dict[str, Any]:
     }
     """
 
-    country_name = _get(user_obj, "location", "country", "name")
-    city = _get(user_obj, "location", "city")
-    status_obj = _get(user_obj, "status")
-    tz = _get(user_obj, "timezone")
+    loc = user_obj.get("location")
+    if not isinstance(loc, dict):
+        loc = {}
+    country = loc.get("country")
+    country_name = country.get("name") if isinstance(country, dict) else None
+    city = loc.get("city")
+    status_obj = user_obj.get("status")
+    tz = user_obj.get("timezone")
 
+    # Only add optional containers when present, to keep JSON clean.
     out: Dict[str, Any] = {
         "username": user_obj.get("username"),
         "closed": user_obj.get("closed"),
         "registration_date": user_obj.get("registration_date"),
         "display_name": user_obj.get("display_name"),
-        # Store as { country: "<name>", city: "<city>" }
-        "location": {
-            "country": country_name,
-            "city": city,
-        },
-        # Store complete status object from API (not just email_verified)
-        "status": status_obj if isinstance(status_obj, dict) else None,
-        "public_name": user_obj.get("public_name"),
-        "timezone": tz if isinstance(tz, dict) else None,
-        "registration_completed": user_obj.get("registration_completed"),
     }
-
-    # Drop None-only containers to keep JSON clean
-    if out["location"].get("country") is None and out["location"].get("city") is None:
-        out["location"] = None
-    if out["status"] is None:
-        out.pop("status", None)
-    if out["timezone"] is None:
-        out.pop("timezone", None)
-    if out.get("location") is None:
-        out.pop("location", None)
+    # Store as { country: "<name>", city: "<city>" }
+    if country_name is not None or city is not None:
+        out["location"] = {"country": country_name, "city": city}
+    # Store complete status object from API (not just email_verified)
+    if isinstance(status_obj, dict):
+        out["status"] = status_obj
+    out["public_name"] = user_obj.get("public_name")
+    if isinstance(tz, dict):
+        out["timezone"] = tz
+    out["registration_completed"] = user_obj.get("registration_completed")
 
     return out
 
@@ -103,17 +97,18 @@ def to_supabase_client_row(user_id: int, minimized_user: Dict[str, Any]) -> Dict
 
     reg_ts = minimized_user.get("registration_date") if isinstance(minimized_user, dict) else None
     reg_at: Optional[int] = None
-    joined_at = None
-    try:
-        if reg_ts is not None:
+    joined_at: Optional[str] = None
+    if reg_ts is not None:
+        try:
             reg_at = int(reg_ts)
-            joined_at = datetime.fromtimestamp(reg_at, tz=timezone.utc).replace(tzinfo=None)
-    except Exception:
-        joined_at = None
-        reg_at = None
+            # Naive UTC "YYYY-MM-DD HH:MM:SS" formatted in C, no datetime objects.
+            joined_at = time.strftime(_JOINED_AT_FMT, time.gmtime(reg_at))
+        except (TypeError, ValueError, OverflowError, OSError):
+            joined_at = None
+            reg_at = None
     if joined_at is None:
         # last-resort: "now" as naive UTC
-        joined_at = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+        joined_at = time.strftime(_JOINED_AT_FMT, time.gmtime())
 
     row: Dict[str, Any] = {
         "id": int(user_id),
@@ -126,7 +121,7 @@ def to_supabase_client_row(user_id: int, minimized_user: Dict[str, Any]) -> Dict
             "city": location.get("city"),
         },
         "timezone": timezone_obj,
-        "joined_at": joined_at.isoformat(sep=" "),
+        "joined_at": joined_at,
         "status": status,
     }
 
@@ -1,8 +1,17 @@
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any, Dict, Optional
 
 from config import CONFIG
 
+
+_session: Optional[Any] = None  # requests.Session, or httpx.Client with CONFIG["http2"]
+_session_token: Optional[str] = None
+_session_lock = threading.Lock()
+
+
 def get_headers() -> dict:
     """
     Freelancer API auth header.
@@ -23,9 +32,78 @@ def api_get(path: str, *, params: Optional[Dict[str, Any]] = None, timeout_s: in
     Convenience GET wrapper for Freelancer API.
 
     `path` can be like '/users/directory/' or 'users/directory/'.
-    Returns the `requests.Response`.
+    Returns the `requests.Response` (an `httpx.Response` when CONFIG["http2"] is set;
+    both expose `status_code`, `json()`, `text` and `raise_for_status()`).
     """
     base = CONFIG["api_base_url"].rstrip("/")
     path = path if path.startswith("/") else f"/{path}"
     url = f"{base}{path}"
-    return requests.get(url, headers=get_headers(), params=params, timeout=timeout_s)
+    return _get_session().get(url, params=params, timeout=timeout_s)
+
+
+def api_get_stream(path: str, *, params: Optional[Dict[str, Any]] = None, timeout_s: int = 30):
+    """
+    Like `api_get`, but the body is not read up front, so it can be parsed while it
+    downloads, e.g. `extract_reviewer_ids(ijson.items(resp.raw, "result.reviews.item"))`
+    (`resp.raw` yields decompressed bytes). With CONFIG["http2"] the response is an
+    `httpx.Response`; read it with `resp.iter_bytes()`.
+
+    The caller must `close()` the response to return the connection to the pool.
+    """
+    base = CONFIG["api_base_url"].rstrip("/")
+    path = path if path.startswith("/") else f"/{path}"
+    url = f"{base}{path}"
+    session = _get_session()
+    if isinstance(session, requests.Session):
+        resp = session.get(url, params=params, timeout=timeout_s, stream=True)
+        # Let file-style readers of resp.raw see the body after gzip decoding.
+        resp.raw.decode_content = True
+        return resp
+    request = session.build_request("GET", url, params=params, timeout=timeout_s)
+    return session.send(request, stream=True)
+
+
+def _get_session() -> Any:
+    """
+    Lazy-init a shared keep-alive session for `api_get`, so repeated calls reuse
+    pooled connections instead of doing a TCP/TLS handshake each time.
+    With CONFIG["http2"] (needs `httpx[http2]`) this is an HTTP/2 `httpx.Client`,
+    so concurrent callers multiplex as streams on one connection.
+    The auth header lives on the session and is refreshed when the token changes.
+    """
+    global _session, _session_token
+    token = CONFIG.get("oauth_access_token")
+    session = _session
+    if session is None or token != _session_token:
+        # fetch_pool workers get here concurrently: build one session, not one each.
+        with _session_lock:
+            if _session is None:
+                if CONFIG.get("http2", False):
+                    # Import only when enabled so the default setup doesn't need httpx.
+                    import httpx
+
+                    session = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                    )
+                else:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=0)
+                    session.mount("https://", adapter)
+                _session = session
+            session = _session
+            if token != _session_token:
+                session.headers.update(get_headers())
+                _session_token = token
+    return session
+
+
+def close_session() -> None:
+    """Close the shared `api_get` session (e.g. at shutdown)."""
+    global _session, _session_token
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _session_token = None
+
@@ -1,59 +1,131 @@
 import random
+import threading
 import time
-from collections import deque
 from dataclasses import dataclass, field
-from typing import Deque, Optional
+from typing import Optional, Union
 
 
 @dataclass
 class RateLimiter:
     """
-    Simple request rate limiter.
+    Adaptive request rate limiter.
 
     - Enforces a minimum interval between calls.
-    - Optionally enforces an RPM cap using a sliding window.
+    - Optionally enforces an RPM cap using a token bucket whose refill rate adapts:
+      on_success() raises it back towards `requests_per_minute`, on_throttle()
+      (a 429) cuts it multiplicatively, never below `rate_min_rpm`.
     - Adds random jitter to make traffic less "machine-like".
+    - Safe to share between threads: each caller reserves its own slot.
     """
 
     min_interval_s: float = 0.8
     requests_per_minute: Optional[int] = 50
     jitter_s: float = 0.2
+    # rate' = min(rate + step, rate * (1 + factor)) on success, capped at requests_per_minute
+    rate_increase_factor: float = 0.05
+    rate_increase_step_rpm: float = 1.0
+    # rate' = max(rate_min_rpm, rate * (1 - factor)) on throttle
+    rate_decrease_factor: float = 0.5
+    rate_min_rpm: float = 5.0
 
     _last_ts: float = field(default=0.0, init=False, repr=False)
-    _window: Deque[float] = field(default_factory=deque, init=False, repr=False)
+    _rate: float = field(default=0.0, init=False, repr=False)  # tokens per second
+    _tokens: float = field(default=1.0, init=False, repr=False)
+    _last_refill: float = field(default=0.0, init=False, repr=False)
+    _paused_until: float = field(default=0.0, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
 
-    def wait(self) -> None:
+    def __post_init__(self) -> None:
+        self._rate = self._max_rate()
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> None:
+        """
+        Block until a request slot is available, then charge it.
+
+        The slot is reserved under the lock (a few float ops) and the caller sleeps
+        after releasing it, so concurrent callers queue up for consecutive slots
+        instead of sleeping one after another while holding the lock.
+        If `cancel` is set while waiting, return early; the caller should check it.
+        """
+        with self._lock:
+            delay = self._reserve()
+        if delay > 0:
+            if cancel is None:
+                time.sleep(delay)
+            else:
+                cancel.wait(delay)
+
+    # Older name, kept for existing callers.
+    wait = acquire
+
+    def pause(self, seconds: float) -> None:
+        """Admit no caller (from any thread) for the next `seconds`."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def on_success(self) -> None:
+        """Additive increase towards the configured RPM cap."""
+        with self._lock:
+            max_rate = self._max_rate()
+            if not max_rate or self._rate >= max_rate:
+                return
+            step = self.rate_increase_step_rpm / 60.0
+            increased = min(self._rate + step, self._rate * (1.0 + self.rate_increase_factor))
+            self._rate = min(max_rate, max(self.rate_min_rpm / 60.0, increased))
+
+    def on_throttle(self, retry_after: Optional[Union[str, float]] = None) -> None:
+        """
+        Multiplicative decrease after a 429.
+
+        A numeric Retry-After also empties the bucket so no caller is admitted
+        before the server says it is ready.
+        """
+        with self._lock:
+            if not self._max_rate():
+                return
+            self._rate = max(self.rate_min_rpm / 60.0, self._rate * (1.0 - self.rate_decrease_factor))
+            try:
+                delay_s = float(retry_after) if retry_after is not None else 0.0
+            except ValueError:
+                delay_s = 0.0
+            if delay_s > 0:
+                self._refill(time.monotonic())
+                self._tokens = min(self._tokens, 1.0 - delay_s * self._rate)
+
+    def _reserve(self) -> float:
+        """Charge the next free slot and return how long to wait until it (lock held)."""
         now = time.monotonic()
+        start = now
 
-        # Enforce RPM cap (sliding window)
-        if self.requests_per_minute:
-            window_s = 60.0
-            cutoff = now - window_s
-            while self._window and self._window[0] < cutoff:
-                self._window.popleft()
+        # Enforce (adaptive) RPM cap (token bucket, burst of 1). The balance may go
+        # negative: later callers then wait for the debt to refill too.
+        if self._rate > 0:
+            self._refill(now)
+            if self._tokens < 1.0:
+                start = now + (1.0 - self._tokens) / self._rate
+            self._tokens -= 1.0
 
-            if len(self._window) >= self.requests_per_minute:
-                oldest = self._window[0]
-                sleep_s = max(0.0, (oldest + window_s) - now)
-                self._sleep(sleep_s)
-                now = time.monotonic()
+        # Shared cooldown (see pause())
+        if self._paused_until > start:
+            start = self._paused_until
 
-        # Enforce minimum interval between requests
+        # Enforce minimum interval between request starts (scheduled, not actual)
         if self._last_ts:
-            gap = now - self._last_ts
-            sleep_s = max(0.0, self.min_interval_s - gap)
-            self._sleep(sleep_s)
+            start = max(start, self._last_ts + self.min_interval_s)
 
         # Add jitter
-        if self.jitter_s and self.jitter_s > 0:
-            self._sleep(random.uniform(0.0, self.jitter_s))
+        if self.jitter_s:
+            start += random.uniform(0.0, self.jitter_s)
 
-        self._last_ts = time.monotonic()
-        if self.requests_per_minute:
-            self._window.append(self._last_ts)
+        self._last_ts = start
+        return start - now
 
-    @staticmethod
-    def _sleep(seconds: float) -> None:
-        if seconds and seconds > 0:
-            time.sleep(seconds)
+    def _refill(self, now: float) -> None:
+        if self._last_refill:
+            self._tokens = min(1.0, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
 
+    def _max_rate(self) -> float:
+        return self.requests_per_minute / 60.0 if self.requests_per_minute else 0.0
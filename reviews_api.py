@@ -1,10 +1,10 @@
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from http_client import FreelancerApiClient
+from http_client import FreelancerApiClient, get_client
 
 
 def fetch_reviews_for_user(
-    client: FreelancerApiClient,
+    client: Optional[FreelancerApiClient] = None,
     *,
     to_user_id: int,
     limit: int = 100,
@@ -18,6 +18,17 @@ def fetch_reviews_for_user(
     (for freelancers with 4000+ reviews). If the API does not support
     offset_start, only the first page is returned.
     """
+    if client is None:
+        client = get_client()
+    params = _reviews_params(
+        to_user_id=to_user_id, limit=limit, compact=compact, offset_start=offset_start
+    )
+    return client.get("/projects/0.1/reviews/", params=params)
+
+
+def _reviews_params(
+    *, to_user_id: int, limit: int, compact: bool, offset_start: Optional[int]
+) -> List[Tuple[str, Any]]:
     params: List[Tuple[str, Any]] = [
         ("limit", limit),
         ("role", "freelancer"),
@@ -31,11 +42,11 @@ def fetch_reviews_for_user(
         params.append(("offset_start", offset_start))
     if compact:
         params.append(("compact", "true"))
-    return client.get("/projects/0.1/reviews/", params=params)
+    return params
 
 
 def fetch_all_reviews_for_user(
-    client: FreelancerApiClient,
+    client: Optional[FreelancerApiClient] = None,
     *,
     to_user_id: int,
     max_reviews: int = 10000,
@@ -50,6 +61,8 @@ def fetch_all_reviews_for_user(
     Returns a payload in the same shape as fetch_reviews_for_user so
     extract_reviews() / extract_reviewer_ids() work unchanged.
     """
+    if client is None:
+        client = get_client()
     all_reviews: List[Dict[str, Any]] = []
     offset = 0
     max_pages = max(1, (max_reviews + page_size - 1) // page_size)
@@ -77,6 +90,49 @@ def fetch_all_reviews_for_user(
     return {"result": {"reviews": all_reviews}}
 
 
+def fetch_all_reviewer_ids_for_user(
+    client: Optional[FreelancerApiClient] = None,
+    *,
+    to_user_id: int,
+    max_reviews: int = 10000,
+    page_size: int = 500,
+    compact: bool = True,
+) -> Set[int]:
+    """
+    Same pagination as fetch_all_reviews_for_user(), but returns only the reviewer
+    IDs. Each page is stream-parsed (see FreelancerApiClient.get_items), so review
+    objects are never held in memory as a list.
+    """
+    if client is None:
+        client = get_client()
+    reviewers: Set[int] = set()
+    seen = 0
+    offset = 0
+    max_pages = max(1, (max_reviews + page_size - 1) // page_size)
+
+    for _ in range(max_pages):
+        page_ids = client.get_items(
+            "/projects/0.1/reviews/",
+            params=_reviews_params(
+                to_user_id=to_user_id, limit=page_size, compact=compact, offset_start=offset
+            ),
+            # Same two shapes (and preference) as extract_reviews().
+            prefix=("result.reviews.item", "reviews.item"),
+            transform=_reviewer_id,
+        )
+        if not page_ids:
+            break
+        # Honor max_reviews exactly, like fetch_all_reviews_for_user
+        page_ids = page_ids[: max_reviews - seen]
+        seen += len(page_ids)
+        reviewers.update(rid for rid in page_ids if rid is not None)
+        if len(page_ids) < page_size or seen >= max_reviews:
+            break
+        offset += len(page_ids)
+
+    return reviewers
+
+
 def extract_reviews(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     result = payload.get("result") if isinstance(payload, dict) else None
     if isinstance(result, dict) and isinstance(result.get("reviews"), list):
@@ -86,23 +142,37 @@ def extract_reviews(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     return []
     
 
-def extract_reviewer_ids(payload: Dict[str, Any]) -> Set[int]:
+def extract_reviewer_ids(payload: Union[Dict[str, Any], Iterable[Dict[str, Any]]]) -> Set[int]:
     """
-    Extract reviewer IDs (from_user_id) from a reviews payload.
+    Extract reviewer IDs (from_user_id) from a reviews payload, or directly from an
+    iterable of review dicts (e.g. streamed with ijson, see oauth.api_get_stream).
     """
+    reviews = extract_reviews(payload) if isinstance(payload, dict) else payload
     reviewers: Set[int] = set()
-    for r in extract_reviews(payload):
-        if not isinstance(r, dict):
-            continue
-        from_uid = r.get("from_user_id")
-        if from_uid is None:
-            from_uid = r.get("from_user")  # fallback (some APIs embed objects)
-        try:
-            if isinstance(from_uid, dict):
-                from_uid = from_uid.get("id") or from_uid.get("user_id")
-            if from_uid is not None:
-                reviewers.add(int(from_uid))
-        except (TypeError, ValueError):
-            continue
+    add = reviewers.add
+    for r in reviews:
+        rid = _reviewer_id(r)
+        if rid is not None:
+            add(rid)
     return reviewers
 
+
+def _reviewer_id(r: Any) -> Optional[int]:
+    # Fast path: plain integer from_user_id (nearly every review).
+    try:
+        return int(r["from_user_id"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    if not isinstance(r, dict):
+        return None
+    from_uid = r.get("from_user_id")
+    if from_uid is None:
+        from_uid = r.get("from_user")  # fallback (some APIs embed objects)
+    try:
+        if isinstance(from_uid, dict):
+            from_uid = from_uid.get("id") or from_uid.get("user_id")
+        if from_uid is not None:
+            return int(from_uid)
+    except (TypeError, ValueError):
+        pass
+    return None
@@ -14,11 +14,13 @@ Usage:
 
 Optional env vars:
   - REG_AT_UNIT: "s" (default) or "ms"
-  - REG_AT_BATCH_SIZE: integer (default 500)
+  - REG_AT_BATCH_SIZE: integer (default 500, max 2000)
+  - REG_AT_WORKERS: concurrent row UPDATEs (default 8, max 32)
 """
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -33,7 +35,13 @@ from config import CONFIG
 from supabase_client import get_supabase_client
 
 
+# Last strptime format that matched. Rows in one backfill share a format, so once the
+# ISO parse has failed for it, try that format first instead of repeating the loop.
+_last_fmt: Optional[str] = None
+
+
 def _parse_joined_at(value: Any) -> Optional[datetime]:
+    global _last_fmt
     if value is None:
         return None
     if isinstance(value, datetime):
@@ -51,6 +59,19 @@ def _parse_joined_at(value: Any) -> Optional[datetime]:
     # - "Z" means UTC
     s = s.replace("Z", "+00:00")
 
+    # PostgREST's own ISO output: nothing else can parse it.
+    if "T" in s and s.endswith("+00:00"):
+        try:
+            return datetime.fromisoformat(s)
+        except Exception:
+            return None
+
+    if _last_fmt is not None:
+        try:
+            return datetime.strptime(s, _last_fmt)
+        except Exception:
+            pass
+
     # Try ISO first
     try:
         dt = datetime.fromisoformat(s)
@@ -61,9 +82,11 @@ def _parse_joined_at(value: Any) -> Optional[datetime]:
     # Try our stored format: "YYYY-MM-DD HH:MM:SS[.ffffff]"
     for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
         try:
-            return datetime.strptime(s, fmt)
+            dt = datetime.strptime(s, fmt)
         except Exception:
             continue
+        _last_fmt = fmt
+        return dt
 
     return None
 
@@ -85,11 +108,50 @@ def _get_batch_size() -> int:
     raw = os.getenv("REG_AT_BATCH_SIZE", "") or ""
     try:
         n = int(raw)
-        return max(1, min(n, 1000))
+        return max(1, min(n, 2000))
     except Exception:
         return 500
 
 
+def _get_workers() -> int:
+    raw = os.getenv("REG_AT_WORKERS", "") or ""
+    try:
+        n = int(raw)
+        return max(1, min(n, 32))
+    except Exception:
+        return 8
+
+
+def _select_page(sb: Any, table: str, last_id: int, batch_size: int) -> List[Dict[str, Any]]:
+    # Keyset pagination by id so updates don't cause skipping.
+    # Pull rows that are missing reg_at; filter joined_at in Python for robustness.
+    resp = (
+        sb.table(table)
+        .select("id, joined_at, reg_at")
+        .is_("reg_at", "null")
+        .gt("id", last_id)
+        .order("id")
+        .limit(batch_size)
+        .execute()
+    )
+    return list(getattr(resp, "data", None) or [])
+
+
+def _update_row(sb: Any, table: str, rid: Any, reg_at: int) -> bool:
+    # Use UPDATE (not UPSERT) to avoid accidental inserts that violate NOT NULL columns.
+    try:
+        (
+            sb.table(table)
+            .update({"reg_at": reg_at})
+            .eq("id", int(rid))
+            .is_("reg_at", "null")
+            .execute()
+        )
+        return True
+    except Exception:
+        return False
+
+
 def main() -> None:
     unit = (os.getenv("REG_AT_UNIT", "s") or "s").strip().lower()
     if unit not in ("s", "ms"):
@@ -99,52 +161,41 @@ def main() -> None:
     sb = get_supabase_client()
 
     batch_size = _get_batch_size()
+    workers = _get_workers()
 
     total_updated = 0
     total_failed = 0
     last_id = 0
-    while True:
-        # Keyset pagination by id so updates don't cause skipping.
-        # Pull rows that are missing reg_at; filter joined_at in Python for robustness.
-        resp = (
-            sb.table(table)
-            .select("id, joined_at, reg_at")
-            .is_("reg_at", "null")
-            .gt("id", last_id)
-            .order("id")
-            .limit(batch_size)
-            .execute()
-        )
-
-        rows: List[Dict[str, Any]] = list(getattr(resp, "data", None) or [])
-        if not rows:
-            break
-
-        # Use UPDATE (not UPSERT) to avoid accidental inserts that violate NOT NULL columns.
-        for r in rows:
-            rid = r.get("id")
-            dt = _parse_joined_at(r.get("joined_at"))
-            if rid is None or dt is None:
-                continue
-
-            reg_at = _to_epoch_int(dt, unit=unit)
+    # One extra worker so the next page's SELECT overlaps this page's UPDATEs.
+    with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+        next_page = pool.submit(_select_page, sb, table, last_id, batch_size)
+        while True:
+            rows = next_page.result()
+            if not rows:
+                break
+
+            # Advance cursor (regardless of how many were updated)
             try:
-                (
-                    sb.table(table)
-                    .update({"reg_at": reg_at})
-                    .eq("id", int(rid))
-                    .is_("reg_at", "null")
-                    .execute()
-                )
-                total_updated += 1
+                last_id = int(rows[-1].get("id") or last_id)
             except Exception:
-                total_failed += 1
-
-        # Advance cursor (regardless of how many were updated)
-        try:
-            last_id = int(rows[-1].get("id") or last_id)
-        except Exception:
-            last_id = last_id
+                last_id = last_id
+            # The next page only has ids > last_id, so it can't see this page's updates.
+            next_page = pool.submit(_select_page, sb, table, last_id, batch_size)
+
+            updates = []
+            for r in rows:
+                rid = r.get("id")
+                dt = _parse_joined_at(r.get("joined_at"))
+                if rid is None or dt is None:
+                    continue
+                reg_at = _to_epoch_int(dt, unit=unit)
+                updates.append(pool.submit(_update_row, sb, table, rid, reg_at))
+
+            for fut in updates:
+                if fut.result():
+                    total_updated += 1
+                else:
+                    total_failed += 1
 
     print(f"updated rows: {total_updated}")
     if total_failed:
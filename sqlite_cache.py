@@ -3,7 +3,23 @@ import os
 import sqlite3
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage import JsonFileCache, dumps_json, loads_json
+
+try:
+    # Optional: zstd-compressed cache payloads (see SqliteUserCache(compress=True)).
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+
+# Every zstd frame starts with this; JSON never does, so both kinds of row can coexist.
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class CacheDecodeError(Exception):
+    """Raised when a compressed cache row can't be decoded with this cache's zstd setup."""
 
 
 def _connect_sqlite(path: str, *, autocommit: bool) -> sqlite3.Connection:
@@ -11,11 +27,20 @@ def _connect_sqlite(path: str, *, autocommit: bool) -> sqlite3.Connection:
     Open a SQLite connection tuned for long-running jobs.
     - timeout/busy_timeout: wait for locks instead of failing immediately
     - WAL: readers won't block writers (and vice versa)
+    - transactional connections BEGIN IMMEDIATE, so a batch takes the write lock up
+      front instead of failing on a read->write lock upgrade
+    - temp_store/cache_size: keep temp b-trees and a 64MB page cache in memory
+    - mmap_size: read pages through a 256MB memory map instead of read() syscalls
     """
-    conn = sqlite3.connect(path, timeout=30, isolation_level=None if autocommit else "")
+    conn = sqlite3.connect(
+        path, timeout=30, isolation_level=None if autocommit else "IMMEDIATE"
+    )
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA busy_timeout=30000;")  # 30s
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-65536;")  # 64MB
+    conn.execute("PRAGMA mmap_size=268435456;")  # 256MB
     return conn
 
 
@@ -26,61 +51,182 @@ class SqliteUserCache:
     - Fast lookups by user_id
     - Incremental writes (no rewriting huge JSON files)
     - Safe for long-running jobs
+    - Optional zstd compression of payloads (`compress=True`, needs `zstandard`),
+      with an optional trained dictionary (see `train_user_cache_zstd_dict`).
+      The repeated JSON keys of minimized users compress very well, which keeps
+      large caches inside the OS page cache. Rows are decoded by their prefix, so
+      compressed and plain rows can be mixed.
     """
 
-    def __init__(self, path: str):
+    _GET_SQL = "SELECT payload_json FROM users WHERE user_id = ?"
+    # Update in place on conflict; INSERT OR REPLACE deletes and re-inserts the row.
+    _UPSERT_SQL = (
+        "INSERT INTO users (user_id, payload_json, schema_version) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET "
+        "payload_json = excluded.payload_json, schema_version = excluded.schema_version"
+    )
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        compress: bool = False,
+        zstd_dict_path: Optional[str] = None,
+        zstd_level: int = 3,
+    ):
         self.path = path
+        self._compressor: Any = None
+        self._decompressor: Any = None
+        # ID of the loaded zstd dictionary (0 = none); frames record the ID they need.
+        self._dict_id = 0
+        if zstandard is not None:
+            zdict = None
+            if zstd_dict_path:
+                with open(zstd_dict_path, "rb") as f:
+                    zdict = zstandard.ZstdCompressionDict(f.read())
+                self._dict_id = zdict.dict_id()
+            # One (de)compressor per cache; the cache is used from a single thread.
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+            if compress:
+                self._compressor = zstandard.ZstdCompressor(level=zstd_level, dict_data=zdict)
+        elif compress:
+            print("[cache] zstandard not installed; storing uncompressed payloads")
         folder = os.path.dirname(path) or "."
         os.makedirs(folder, exist_ok=True)
         # Use transactional mode for batch writes (executemany).
         self.conn = _connect_sqlite(path, autocommit=False)
+        # payload_json holds UTF-8 JSON bytes. Older DBs declared it TEXT; SQLite
+        # keeps BLOB values as-is under TEXT affinity and str rows still decode.
+        # New tables are WITHOUT ROWID: user_id is the only key, so rows live in the
+        # primary-key b-tree itself (payloads are small minimized users).
+        # schema_version: normalize.MINIMIZED_SCHEMA_VERSION the payload was written with
+        # (0 = unknown, e.g. rows from before the column or migrated from JSON).
         self.conn.execute(
             """
             CREATE TABLE IF NOT EXISTS users (
               user_id INTEGER PRIMARY KEY,
-              payload_json TEXT NOT NULL
-            )
+              payload_json BLOB NOT NULL,
+              schema_version INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
             """
         )
+        self._migrate_schema()
         self.conn.commit()
 
+    def _migrate_schema(self) -> None:
+        """Best-effort migration for older DBs: add schema_version if missing."""
+        cols = [str(r[1]) for r in self.conn.execute("PRAGMA table_info(users)").fetchall()]
+        if "schema_version" not in cols:
+            # Existing rows predate versioning: mark them unknown (0).
+            self.conn.execute(
+                "ALTER TABLE users ADD COLUMN schema_version INTEGER NOT NULL DEFAULT 0"
+            )
+
     def close(self) -> None:
         try:
             self.conn.close()
         except Exception:
             pass
 
+    def _encode(self, obj: Dict[str, Any]) -> bytes:
+        data = dumps_json(obj)
+        if self._compressor is not None:
+            return self._compressor.compress(data)
+        return data
+
+    def _decode(self, raw: Any) -> Any:
+        if isinstance(raw, bytes) and raw[:4] == _ZSTD_MAGIC:
+            if self._decompressor is None:
+                raise CacheDecodeError("zstd-compressed cache row but zstandard is not installed")
+            try:
+                frame_dict_id = zstandard.get_frame_parameters(raw).dict_id
+                if frame_dict_id and frame_dict_id != self._dict_id:
+                    raise CacheDecodeError(
+                        f"cache row was compressed with zstd dictionary {frame_dict_id}, "
+                        f"but {'none' if not self._dict_id else self._dict_id} is loaded "
+                        "(check user_cache_zstd_dict)"
+                    )
+                raw = self._decompressor.decompress(raw)
+            except zstandard.ZstdError as e:
+                raise CacheDecodeError(f"cannot decompress cache row: {e}") from e
+        return loads_json(raw)
+
     def get(self, user_id: int) -> Optional[Dict[str, Any]]:
-        cur = self.conn.execute(
-            "SELECT payload_json FROM users WHERE user_id = ? LIMIT 1", (int(user_id),)
-        )
-        row = cur.fetchone()
+        # user_id is the PRIMARY KEY, so no LIMIT is needed.
+        row = self.conn.execute(self._GET_SQL, (int(user_id),)).fetchone()
         if not row:
             return None
         try:
-            return json.loads(row[0])
+            return self._decode(row[0])
+        except CacheDecodeError:
+            raise
         except Exception:
             return None
 
-    def set(self, user_id: int, user_obj: Dict[str, Any]) -> None:
+    def iter_ids(self, *, schema_version: Optional[int] = None) -> Iterator[int]:
+        """
+        Yield every cached user_id (no payload decoding); with `schema_version`, only
+        the users stored with that version.
+        """
+        if schema_version is None:
+            cur = self.conn.execute("SELECT user_id FROM users")
+        else:
+            cur = self.conn.execute(
+                "SELECT user_id FROM users WHERE schema_version = ?", (int(schema_version),)
+            )
+        for (uid,) in cur:
+            yield int(uid)
+
+    def set(
+        self,
+        user_id: int,
+        user_obj: Dict[str, Any],
+        *,
+        schema_version: int = 0,
+    ) -> None:
         self.conn.execute(
-            "INSERT OR REPLACE INTO users (user_id, payload_json) VALUES (?, ?)",
-            (int(user_id), json.dumps(user_obj, ensure_ascii=False)),
+            self._UPSERT_SQL, (int(user_id), self._encode(user_obj), int(schema_version))
         )
 
-    def set_many(self, items: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
-        rows = [
-            (int(uid), json.dumps(obj, ensure_ascii=False)) for uid, obj in items
-        ]
-        if not rows:
-            return
+    def set_many(
+        self,
+        items: Iterable[Tuple[int, Dict[str, Any]]],
+        *,
+        schema_version: int = 0,
+    ) -> None:
+        # JSON bytes are stored as-is (BLOB values), skipping a str round-trip.
+        version = int(schema_version)
+        rows = [(int(uid), self._encode(obj), version) for uid, obj in items]
+        if rows:
+            self._executemany_with_retry(self._UPSERT_SQL, rows, commit=False)
+
+    def bulk_set(
+        self,
+        items: Iterable[Tuple[int, Dict[str, Any]]],
+        *,
+        schema_version: int = 0,
+    ) -> None:
+        """
+        Write `items` in a single transaction and commit it: one WAL append and
+        sync for the whole batch instead of per statement.
+        """
+        version = int(schema_version)
+        rows = [(int(uid), self._encode(obj), version) for uid, obj in items]
+        if rows:
+            self._executemany_with_retry(self._UPSERT_SQL, rows, commit=True)
+
+    def _executemany_with_retry(
+        self, sql: str, rows: List[Tuple[Any, ...]], *, commit: bool
+    ) -> None:
         # Retry a few times if another connection is briefly writing.
         for attempt in range(6):
             try:
-                self.conn.executemany(
-                    "INSERT OR REPLACE INTO users (user_id, payload_json) VALUES (?, ?)",
-                    rows,
-                )
+                if commit:
+                    # Commits on success, rolls back (so the batch can be retried) on error.
+                    with self.conn:
+                        self.conn.executemany(sql, rows)
+                else:
+                    self.conn.executemany(sql, rows)
                 return
             except sqlite3.OperationalError as e:
                 if "locked" not in str(e).lower():
@@ -240,17 +386,47 @@ class SqliteCompletedFreelancers:
         return
 
 
+def train_user_cache_zstd_dict(
+    sqlite_path: str, dict_path: str, *, samples: int = 10000, dict_size: int = 131072
+) -> int:
+    """
+    Train a zstd dictionary from up to `samples` cached payloads and write it to
+    `dict_path` (pass it back as `SqliteUserCache(zstd_dict_path=...)`).
+    Returns the dictionary size in bytes. Requires `zstandard`.
+    """
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    cache = SqliteUserCache(sqlite_path)
+    try:
+        payloads: List[bytes] = []
+        cur = cache.conn.execute("SELECT payload_json FROM users LIMIT ?", (int(samples),))
+        for (raw,) in cur:
+            try:
+                payloads.append(dumps_json(cache._decode(raw)))
+            except CacheDecodeError:
+                raise
+            except Exception:
+                continue
+    finally:
+        cache.close()
+    zdict = zstandard.train_dictionary(dict_size, payloads)
+    data = zdict.as_bytes()
+    with open(dict_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
 def migrate_json_cache_to_sqlite(json_path: str, sqlite_path: str) -> int:
     """
     One-time helper: migrate existing JsonFileCache { "<id>": {...} } into SQLite.
     Returns number of migrated records.
     """
-    if not os.path.exists(json_path):
+    if not os.path.exists(json_path) and not os.path.exists(json_path + ".log"):
         return 0
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # Snapshot (parsed in one native call) plus any appended update log.
+        data = JsonFileCache(json_path).data
     except Exception:
         return 0
 
@@ -272,14 +448,14 @@ def migrate_json_cache_to_sqlite(json_path: str, sqlite_path: str) -> int:
             if bool(v.get("closed")):
                 continue
             batch.append((uid, v))
-            if len(batch) >= 1000:
-                cache.set_many(batch)
-                cache.commit()
+            # Legacy JSON payloads have no known minimize_user version: stored as 0, so the
+            # lead generator refetches and re-normalizes them when they come up.
+            if len(batch) >= 10000:
+                cache.bulk_set(batch, schema_version=0)
                 migrated += len(batch)
                 batch = []
         if batch:
-            cache.set_many(batch)
-            cache.commit()
+            cache.bulk_set(batch, schema_version=0)
             migrated += len(batch)
         return migrated
     finally:
@@ -1,15 +1,41 @@
 import json
 import os
 import tempfile
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+try:
+    # Optional C-accelerated JSON; falls back to stdlib json when not installed.
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+def dumps_json(obj: Any, *, indent: bool = False, newline: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes (orjson when available), optionally "\n"-terminated."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    text = json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+    return (text + "\n" if newline else text).encode("utf-8")
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """Parse JSON from bytes/str (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 def load_json(path: str, *, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     if default is None:
         default = {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            return loads_json(f.read())
     except FileNotFoundError:
         return dict(default)
     except json.JSONDecodeError:
@@ -21,11 +47,17 @@ def save_json_atomic(path: str, data: Dict[str, Any]) -> None:
     folder = os.path.dirname(path) or "."
     os.makedirs(folder, exist_ok=True)
 
+    buf = memoryview(dumps_json(data, indent=True, newline=True))
     fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            f.write("\n")
+        try:
+            # Raw fd writes (no file object buffering); loop in case of a short write.
+            while buf:
+                buf = buf[os.write(fd, buf) :]
+            # Make the new contents durable before the rename publishes them.
+            os.fsync(fd)
+        finally:
+            os.close(fd)
         os.replace(tmp_path, path)
     finally:
         try:
@@ -38,26 +70,124 @@ def save_json_atomic(path: str, data: Dict[str, Any]) -> None:
 def append_jsonl(path: str, obj: Dict[str, Any]) -> None:
     folder = os.path.dirname(path) or "."
     os.makedirs(folder, exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    with open(path, "ab") as f:
+        f.write(dumps_json(obj, newline=True))
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL writer that keeps one buffered file handle for a whole run
+    instead of an open/write/close per record (see `append_jsonl`).
+
+    The file is opened lazily on the first write; records are flushed every
+    `flush_every` writes, on `flush()` and on `close()`.
+    """
+
+    def __init__(self, path: str, *, flush_every: int = 100, buffer_size: int = 1 << 20):
+        self.path = path
+        self.flush_every = max(1, int(flush_every))
+        self.buffer_size = buffer_size
+        self._f: Optional[BinaryIO] = None
+        self._pending = 0
+
+    def write(self, obj: Dict[str, Any]) -> None:
+        if self._f is None:
+            folder = os.path.dirname(self.path) or "."
+            os.makedirs(folder, exist_ok=True)
+            self._f = open(self.path, "ab", buffering=self.buffer_size)
+        self._f.write(dumps_json(obj, newline=True))
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._f is not None and self._pending:
+            self._f.flush()
+            self._pending = 0
+
+    def close(self) -> None:
+        if self._f is not None:
+            try:
+                self._f.close()
+            finally:
+                self._f = None
+                self._pending = 0
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
 
 
 class JsonFileCache:
     """
     Very small persistent cache for user objects keyed by ID.
-    Stored as a single JSON dict { "<id>": {...}, ... }.
+
+    Stored as a JSON dict snapshot { "<id>": {...}, ... } plus an append-only
+    `<path>.log` of later updates (one {"id": ..., "obj": ...} per line), so each
+    `set` writes one record instead of rewriting the whole dict. The log is replayed
+    on load and folded back into the snapshot by `compact()`, which runs
+    automatically every `compact_every` updates.
     """
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, *, compact_every: int = 10000):
         self.path = path
+        self.log_path = path + ".log"
+        self.compact_every = max(1, int(compact_every))
         self.data: Dict[str, Any] = load_json(path, default={})
+        self._log_entries = self._replay_log()
+        self._log = JsonlWriter(self.log_path, flush_every=1)
+
+    def _replay_log(self) -> int:
+        count = 0
+        try:
+            f = open(self.log_path, "r+b")
+        except FileNotFoundError:
+            return 0
+        with f:
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):
+                    # Torn last line from a crash mid-append: cut it off so the next
+                    # append starts on a fresh line.
+                    f.truncate(f.tell() - len(line))
+                    break
+                try:
+                    entry = loads_json(line)
+                    self.data[str(entry["id"])] = entry["obj"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                count += 1
+        return count
 
     def get(self, user_id: int) -> Optional[Dict[str, Any]]:
         return self.data.get(str(user_id))
 
     def set(self, user_id: int, user_obj: Dict[str, Any]) -> None:
         self.data[str(user_id)] = user_obj
+        self._log.write({"id": int(user_id), "obj": user_obj})
+        self._log_entries += 1
+        if self._log_entries >= self.compact_every:
+            self.compact()
 
     def save(self) -> None:
+        # Updates are already on disk in the log; nothing to rewrite.
+        self._log.flush()
+
+    def compact(self) -> None:
+        """Rewrite the snapshot with all logged updates and drop the log."""
+        self._log.close()
         save_json_atomic(self.path, self.data)
+        # Replaying a leftover log over the new snapshot is harmless, so a crash
+        # between the two steps loses nothing.
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self._log_entries = 0
 
+    def close(self) -> None:
+        self._log.close()
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import atexit
+import threading
 from typing import Optional
 
 from config import CONFIG
 
 
 _client = None
+_client_lock = threading.Lock()
 
 
 def get_supabase_client():
@@ -19,7 +22,14 @@ def get_supabase_client():
     global _client
     if _client is not None:
         return _client
+    with _client_lock:
+        if _client is None:
+            _client = _create_client()
+            atexit.register(close)
+    return _client
+
 
+def _create_client():
     url = str(CONFIG.get("supabase_url", "") or "")
     key = str(CONFIG.get("supabase_service_role_key", "") or "")
     if not url or url.startswith("<") or not key or key.startswith("<"):
@@ -31,6 +41,29 @@ def get_supabase_client():
     # Import only when needed so the project can run without Supabase installed.
     from supabase import create_client  # type: ignore
 
-    _client = create_client(url, key)
-    return _client
+    return create_client(url, key)
+
+
+def close() -> None:
+    """
+    Close the shared client's PostgREST HTTP session (registered with atexit).
+
+    supabase-py keeps one httpx session per client for all table requests, so the
+    shared `_client` already reuses its keep-alive connections; this just closes
+    them cleanly at exit instead of leaving it to garbage collection.
+    """
+    global _client
+    client, _client = _client, None
+    if client is None:
+        return
+    # Look at the instance attributes directly: the `postgrest` property would build
+    # a new PostgREST client if none was created yet.
+    attrs = getattr(client, "__dict__", {})
+    postgrest = attrs.get("_postgrest") or attrs.get("postgrest")
+    session = getattr(postgrest, "session", None)
+    if session is not None:
+        try:
+            session.close()
+        except Exception:
+            pass
 
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import threading
 from typing import Any, Dict, Iterable, List
 
 from config import CONFIG
 from supabase_client import get_supabase_client
 
 
-_warned_missing = False
+# Resolved once: the client on success, or _sb_disabled after the first failure
+# (e.g. Supabase not configured), so later calls skip the lookup entirely.
+_sb: Any = None
+_sb_disabled = False
+_sb_lock = threading.Lock()
 
 
 def upsert_users(user_rows: Iterable[Dict[str, Any]]) -> bool:
@@ -25,31 +30,43 @@ def upsert_users(user_rows: Iterable[Dict[str, Any]]) -> bool:
         "status": <json>
       }
 
-    Table name comes from CONFIG['supabase_table_users'].
+    Table name comes from CONFIG['supabase_table_users']. Rows are sent in chunks of
+    CONFIG['supabase_upsert_batch_size'] (default 1000) per request; returns False if
+    any chunk failed.
     """
-    global _warned_missing
+    global _sb, _sb_disabled
 
     rows = [r for r in user_rows if isinstance(r, dict) and r.get("id") is not None]
     if not rows:
         return True
 
-    try:
-        sb = get_supabase_client()
-    except Exception as e:
-        # Don't crash the whole lead generation if Supabase isn't configured.
-        if not _warned_missing:
-            print(f"[supabase] disabled: {e}")
-            _warned_missing = True
+    if _sb_disabled:
+        return False
+    if _sb is None:
+        # Worker threads upsert concurrently: resolve (and report failure) only once.
+        with _sb_lock:
+            if _sb is None and not _sb_disabled:
+                try:
+                    _sb = get_supabase_client()
+                except Exception as e:
+                    # Don't crash the whole lead generation if Supabase isn't configured.
+                    print(f"[supabase] disabled: {e}")
+                    _sb_disabled = True
+    sb = _sb
+    if sb is None:
         return False
 
     table = str(CONFIG.get("supabase_table_users", "clients"))
-    # on_conflict ensures id-based upsert
-    try:
-        sb.table(table).upsert(rows, on_conflict="id").execute()
-    except Exception as e:
-        # Don't crash the whole lead generation if Supabase has a transient failure.
-        print(f"[supabase] upsert failed (table={table}): {e}")
-        return False
+    batch_size = max(1, int(CONFIG.get("supabase_upsert_batch_size", 1000)))
+    ok = True
+    for i in range(0, len(rows), batch_size):
+        # on_conflict ensures id-based upsert
+        try:
+            sb.table(table).upsert(rows[i : i + batch_size], on_conflict="id").execute()
+        except Exception as e:
+            # Don't crash the whole lead generation if Supabase has a transient failure.
+            print(f"[supabase] upsert failed (table={table}): {e}")
+            ok = False
 
-    return True
+    return ok
 
@@ -1,10 +1,54 @@
+from concurrent.futures import Executor
+from itertools import islice
 from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
 
-from http_client import FreelancerApiClient
+from config import CONFIG
+from http_client import FreelancerApiClient, get_client
+
+
+# Optional per-user detail blocks the directory endpoint can embed. Each one makes
+# every page bigger and slower to serve/decode, so only request what we consume
+# (location is stored for completed freelancers; status is small). Override with
+# CONFIG["directory_detail_fields"].
+_DIRECTORY_DETAIL_FIELDS: Tuple[str, ...] = (
+    "avatar",
+    "country_details",
+    "display_info",
+    "job_ranks",
+    "jobs",
+    "location_details",
+    "online_offline_details",
+    "preferred_details",
+    "profile_description",
+    "pool_details",
+    "qualification_details",
+    "reputation",
+    "rising_star",
+    "status",
+)
+_DEFAULT_DIRECTORY_DETAIL_FIELDS: Tuple[str, ...] = ("location_details", "status")
+
+
+def _directory_base_query() -> str:
+    enabled = set(CONFIG.get("directory_detail_fields", _DEFAULT_DIRECTORY_DETAIL_FIELDS))
+    # Sort by review_count: reverse_sort=false => most reviews first.
+    params: List[Tuple[str, Any]] = [
+        ("reverse_sort", "false"),
+        ("review_count_min", 1),
+        ("sort_field", "review_count"),
+    ]
+    params.extend((name, "true") for name in _DIRECTORY_DETAIL_FIELDS if name in enabled)
+    params.extend((("webapp", 1), ("new_errors", "true"), ("new_pools", "true")))
+    return urlencode(params)
+
+
+# Constant part of the directory query, encoded once at import instead of per page.
+_DIRECTORY_BASE_QUERY = _directory_base_query()
 
 
 def fetch_directory_page(
-    client: FreelancerApiClient,
+    client: Optional[FreelancerApiClient] = None,
     *,
     limit: int,
     offset: int,
@@ -14,36 +58,16 @@ def fetch_directory_page(
     """
     Fetch one page from /users/0.1/users/directory/
 
-    Keep params minimal to reduce payload and rate-limit risk.
+    Keep params minimal to reduce payload and rate-limit risk: only the detail
+    blocks in CONFIG["directory_detail_fields"] are requested.
     """
-    # Sort by review_count: reverse_sort=false => most reviews first.
-    params: List[Tuple[str, Any]] = [
-        ("limit", limit),
-        ("offset", offset),
-        ("query", query),
-        ("reverse_sort", "false"),
-        ("review_count_min", 1),
-        ("sort_field", "review_count"),
-        ("avatar", "true"),
-        ("country_details", "true"),
-        ("display_info", "true"),
-        ("job_ranks", "true"),
-        ("jobs", "true"),
-        ("location_details", "true"),
-        ("online_offline_details", "true"),
-        ("preferred_details", "true"),
-        ("profile_description", "true"),
-        ("pool_details", "true"),
-        ("qualification_details", "true"),
-        ("reputation", "true"),
-        ("rising_star", "true"),
-        ("status", "true"),
-        ("webapp", 1),
-        ("new_errors", "true"),
-        ("new_pools", "true"),
-    ]
+    if client is None:
+        client = get_client()
+    # Only limit/offset/query vary per page; the rest is the pre-encoded query string.
+    params = urlencode((("limit", limit), ("offset", offset), ("query", query)))
+    params = f"{params}&{_DIRECTORY_BASE_QUERY}"
     if compact:
-        params.append(("compact", "true"))
+        params += "&compact=true"
     return client.get("/users/0.1/users/directory/", params=params)
 
 
@@ -73,7 +97,7 @@ def extract_user_id(user_obj: Dict[str, Any]) -> Optional[int]:
 
 
 def fetch_users_by_ids(
-    client: FreelancerApiClient,
+    client: Optional[FreelancerApiClient],
     user_ids: Iterable[int],
     *,
     compact: bool = True,
@@ -84,39 +108,90 @@ def fetch_users_by_ids(
     /users/0.1/users?users[]=1&users[]=2...
 
     Keep params minimal; add more flags only if you truly need them.
+    Pass client=None to use the shared `get_client()` instance.
     """
-    params: List[Tuple[str, Any]] = []
-    for uid in user_ids:
-        params.append(("users[]", int(uid)))
+    if client is None:
+        client = get_client()
+    # Build the query string directly: one join instead of a tuple + urlencode per ID.
+    ids = [int(uid) for uid in user_ids]
+    parts: List[str] = []
+    if ids:
+        parts.append("users%5B%5D=" + "&users%5B%5D=".join(map(str, ids)))
     if status:
         # Ensure we get the full `status` object, not just partial fields.
-        params.append(("status", "true"))
+        parts.append("status=true")
     if compact:
-        params.append(("compact", "true"))
-    return client.get("/users/0.1/users", params=params)
+        parts.append("compact=true")
+    return client.get("/users/0.1/users", params="&".join(parts))
+
+
+def fetch_users_by_ids_chunked(
+    client: Optional[FreelancerApiClient],
+    user_ids: Iterable[int],
+    *,
+    chunk: int = 50,
+    compact: bool = True,
+    status: bool = True,
+    executor: Optional[Executor] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Fetch any number of users as ceil(N / chunk) `fetch_users_by_ids` calls and
+    merge them into {user_id: user_dict}.
+
+    Chunking keeps each URL well under common 8KB limits (~15 bytes per `users[]=`
+    param). With `executor`, chunks are fetched concurrently.
+
+    Rate-limit math: the limiter paces HTTP requests, not IDs, so N IDs cost
+    ceil(N / chunk) slots of `requests_per_minute`.
+    """
+    if client is None:
+        client = get_client()
+    it = iter(user_ids)
+    batches: List[List[int]] = []
+    while True:
+        batch = list(islice(it, max(1, chunk)))
+        if not batch:
+            break
+        batches.append(batch)
+
+    out: Dict[int, Dict[str, Any]] = {}
+    if executor is None:
+        for batch in batches:
+            out.update(extract_users_map(fetch_users_by_ids(client, batch, compact=compact, status=status)))
+        return out
+
+    futures = [
+        executor.submit(fetch_users_by_ids, client, batch, compact=compact, status=status)
+        for batch in batches
+    ]
+    # Merge in submission order so the result doesn't depend on completion order.
+    try:
+        for fut in futures:
+            out.update(extract_users_map(fut.result()))
+    except BaseException:
+        # Don't let the remaining chunks keep hitting the API after a failure (e.g. 429).
+        for fut in futures:
+            fut.cancel()
+        raise
+    return out
 
 
 def extract_users_map(payload: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
     """
     Normalize response to a dict: {user_id: user_dict}
     """
-    users: List[Dict[str, Any]] = []
-    result = payload.get("result") if isinstance(payload, dict) else None
-    if isinstance(result, dict) and isinstance(result.get("users"), list):
-        users = result["users"]
-    elif isinstance(result, dict) and isinstance(result.get("users"), dict):
-        users = [u for u in result["users"].values() if isinstance(u, dict)]
-    elif isinstance(payload.get("users"), list):
-        users = payload["users"]
-    elif isinstance(payload.get("users"), dict):
-        users = [u for u in payload["users"].values() if isinstance(u, dict)]
-
     out: Dict[int, Dict[str, Any]] = {}
-    for u in users:
+    # One pass over extract_users(); the ID lookup is extract_user_id() inlined.
+    for u in extract_users(payload):
         if not isinstance(u, dict):
             continue
-        uid = extract_user_id(u)
-        if uid is not None:
-            out[uid] = u
+        uid = u.get("id")
+        if uid is None:
+            uid = u.get("user_id")
+            if uid is None:
+                continue
+        try:
+            out[int(uid)] = u
+        except (TypeError, ValueError):
+            continue
     return out
-